@@ -1,17 +1,21 @@
 from crewai import Agent, Task, Crew , LLM
 import os
 from extracttool import FeedGuideNavigator
+from browser_pool import warm_up
+from parser import staging_dir
 import json
 from dotenv import load_dotenv
 load_dotenv()
 
 openai_llm=LLM(model="gpt-4o-mini", api_key=os.getenv("OPENAI_API_KEY"))
 
+feed_navigator = FeedGuideNavigator()
+
 data_extractor_agent = Agent(
     role="DataExtractorAgent",
     goal="Extract data from websites as per the provided feed guide and save the files locally.",
     backstory="An agent that uses a feed guide to navigate websites and download files.",
-    tools=[FeedGuideNavigator()],
+    tools=[feed_navigator],
     # llm=openai_llm
 )
 
@@ -35,5 +39,7 @@ task=Task(
 
 
 crew = Crew(agents=[data_extractor_agent], tasks=[task],verbose=True)
+# launch the browser now so the tool call doesn't pay the cold start
+warm_up(downloads_path=staging_dir(feed_navigator.download_dir))
 result= crew.kickoff(inputs={"feed_guide": philly_feed})
 print("Final Result:", result)
\ No newline at end of file
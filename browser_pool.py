@@ -0,0 +1,106 @@
+# browser_pool.py
+import os
+import atexit
+from typing import Any, Dict, Optional, Tuple
+from playwright.sync_api import sync_playwright
+
+# one Playwright driver + one browser per (browser_name, headless, downloads_path), shared by all runners;
+# downloads_path is left out of the key when attached over CDP
+_playwright = None
+_browsers: Dict[Tuple[str, bool, Optional[str]], object] = {}
+
+# set to attach to an already running Chromium (e.g. started with --remote-debugging-port=9222)
+CDP_URL_ENV = "PLAYWRIGHT_CDP_URL"
+
+# feed scraping never needs GPU, extensions or Chrome's background services;
+# --disable-dev-shm-usage avoids crashes when /dev/shm is small (containers)
+CHROMIUM_ARGS = [
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-default-apps",
+    "--no-first-run",
+    "--disable-sync",
+    "--disable-translate",
+    "--metrics-recording-only",
+    "--mute-audio",
+]
+
+
+def launch_options(
+    browser_name: str = "chromium", headless: bool = True, downloads_path: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Keyword arguments for BrowserType.launch, shared by the pool and persistent-profile launches.
+    downloads_path: where the browser writes download artifacts; on the same filesystem as the
+    destination, a finished download can be renamed into place instead of copied.
+    """
+    options: Dict[str, Any] = {"headless": headless, "downloads_path": downloads_path}
+    if browser_name == "chromium":
+        options["args"] = CHROMIUM_ARGS
+        options["ignore_default_args"] = ["--enable-automation"]
+    return options
+
+
+def get_playwright():
+    """Return the shared Playwright driver, starting it on first use."""
+    global _playwright
+    if _playwright is None:
+        _playwright = sync_playwright().start()
+    return _playwright
+
+
+def get_browser(browser_name: str = "chromium", headless: bool = True, downloads_path: Optional[str] = None):
+    """
+    Return a long-lived browser, launching it on first use.
+    downloads_path is fixed at launch, so each distinct downloads_path gets its own browser.
+    If PLAYWRIGHT_CDP_URL is set, chromium is attached over CDP instead of launched,
+    so several processes/agents can share one browser; downloads_path does not apply then,
+    and every caller shares the one connection.
+    Callers should open their own BrowserContext and close only that.
+    """
+    cdp_url = os.getenv(CDP_URL_ENV) if browser_name == "chromium" else None
+    key = (browser_name, headless, None if cdp_url else downloads_path)
+    browser = _browsers.get(key)
+    if browser is not None and browser.is_connected():
+        return browser
+    browser_launcher = getattr(get_playwright(), browser_name)
+    if cdp_url:
+        browser = browser_launcher.connect_over_cdp(cdp_url)
+    else:
+        browser = browser_launcher.launch(**launch_options(browser_name, headless, downloads_path))
+    _browsers[key] = browser
+    return browser
+
+
+def warm_up(browser_name: str = "chromium", headless: bool = True, downloads_path: Optional[str] = None):
+    """
+    Start the driver and pooled browser ahead of the first run.
+    Must be called from the thread that will run the feeds: the sync Playwright API is
+    bound to the thread that started it, so this cannot be pushed to a background thread.
+    """
+    get_browser(browser_name, headless, downloads_path)
+
+
+def close_browser():
+    """
+    Close every pooled browser and stop the Playwright driver.
+    For a CDP-attached browser this only disconnects; the remote Chromium keeps running.
+    """
+    global _playwright
+    for browser in _browsers.values():
+        try:
+            browser.close()
+        except Exception:
+            pass
+    _browsers.clear()
+    if _playwright:
+        try:
+            _playwright.stop()
+        except Exception:
+            pass
+        _playwright = None
+
+
+atexit.register(close_browser)
@@ -1,24 +1,54 @@
 # crew_tool_wrapper.py
 from crewai.tools import BaseTool    # adjust import to your crewai package
-from typing import Dict, Any
-from parser import FeedGuideRunner
+from typing import Dict, Any, Optional
+import functools
+import orjson
+from pydantic import PrivateAttr
+from parser import AsyncFeedGuideRunner
+
+# with a persistent profile, tool calls served by one browser before it is relaunched
+PROFILE_REFRESH_RUNS = 20
+
+
+@functools.lru_cache(maxsize=32)
+def _parse_feed_guide(feed_guide: str) -> Dict[str, Any]:
+    # agent retries resend the identical string, so a parse is only paid once.
+    # the runner only reads the feed, so sharing the cached dict is safe
+    return orjson.loads(feed_guide)
+
 
 class FeedGuideNavigator(BaseTool):
     name: str = "feed_guide_navigator"
     description: str = "Executes a feed guide to navigate a site and download files"
     download_dir: str = "./downloads"
+    user_data_dir: Optional[str] = None  # e.g. parser.DEFAULT_PROFILE_DIR to keep the browser cache warm
+    _profile_runner: Optional[AsyncFeedGuideRunner] = PrivateAttr(default=None)
 
     def _run(self, feed_guide: Dict[str, Any]) -> Dict[str, Any]:
         # 👇 Normalize CrewAI's stringified JSON input
         
         if isinstance(feed_guide, str):
-            import json
             try:
-                feed_guide = json.loads(feed_guide)
+                feed_guide = _parse_feed_guide(feed_guide)
             except Exception:
                 return {"error": "Invalid feed_guide format"}
 
-        runner = FeedGuideRunner(download_dir=self.download_dir, headless=True, reuse_browser=False)
-        res = runner.run(feed_guide)
+        if self.user_data_dir:
+            # a persistent profile is its own browser: keep it up across calls
+            if self._profile_runner is None:
+                self._profile_runner = AsyncFeedGuideRunner(
+                    download_dir=self.download_dir,
+                    headless=True,
+                    reuse_browser=True,
+                    context_refresh_runs=PROFILE_REFRESH_RUNS,
+                    user_data_dir=self.user_data_dir,
+                )
+            res = self._profile_runner.run(feed_guide)
+        else:
+            runner = AsyncFeedGuideRunner(download_dir=self.download_dir, headless=True, reuse_browser=False)
+            try:
+                res = runner.run(feed_guide)
+            finally:
+                runner.close()
         print("FeedGuideNavigator result:", res)
         return res
\ No newline at end of file
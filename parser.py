@@ -1,9 +1,128 @@
 # feedguide_runner.py
 import os
+import re
 import time
+import shutil
+import asyncio
+import functools
+import tempfile
+import json
+import importlib.util
 import requests
-from typing import Dict, List, Any, Optional
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+import httpx
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+from browser_pool import CDP_URL_ENV, get_browser, get_playwright, launch_options
+
+# upper bound on concurrent direct-url downloads in AsyncFeedGuideRunner
+MAX_PARALLEL_PAGES = 3
+# worker threads for consecutive direct-url downloads in FeedGuideRunner
+MAX_PARALLEL_DOWNLOADS = 4
+# read size for streamed downloads; small chunks make the Python loop the bottleneck
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+# httpx only speaks HTTP/2 with the optional h2 package (httpx[http2]) installed
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+# elements considered clickable when matching by text
+CLICKABLE_SELECTOR = "a, button, [role=link], [role=button]"
+# subdirectory of download_dir where the browser stages download artifacts
+STAGING_DIRNAME = ".staging"
+# suggested user_data_dir for FeedGuideRunner's persistent profile
+DEFAULT_PROFILE_DIR = os.path.expanduser("~/.cache/feedguide/profile")
+# navigations are done once the DOM is ready; "load" also waits for every image/tracker
+DEFAULT_WAIT_UNTIL = "domcontentloaded"
+# suggested selector_cache_path for FeedGuideRunner (which element a click-by-text resolved to, per page)
+DEFAULT_SELECTOR_CACHE = os.path.expanduser("~/.cache/feedguide/selectors.json")
+# how long a cached selector may take to show up (pages render after domcontentloaded)
+SELECTOR_CACHE_WAIT_MS = 5000
+# builds a stable CSS path (nearest id, then :nth-of-type steps) for an element, or null if its
+# text content lacks the needle: replay filters by text, so a match by aria-label/title/alt never replays
+CSS_PATH_JS = """(el, needle) => {
+    if (!(el.textContent || '').replace(/\\s+/g, ' ').toLowerCase().includes(needle)) return null;
+    const parts = [];
+    for (; el && el.nodeType === 1 && el !== document.documentElement; el = el.parentElement) {
+        if (el.id) { parts.unshift('#' + CSS.escape(el.id)); break; }
+        let i = 1;
+        for (let s = el.previousElementSibling; s; s = s.previousElementSibling) {
+            if (s.tagName === el.tagName) i++;
+        }
+        parts.unshift(el.tagName.toLowerCase() + ':nth-of-type(' + i + ')');
+    }
+    return parts.join(' > ');
+}"""
+# requests aborted when block_resources is on. Stylesheets are kept: they decide which
+# elements are visible, and so which one a click by text lands on
+BLOCKED_RESOURCE_TYPES = frozenset(("image", "font", "media"))
+BLOCKED_URL_PARTS = ("google-analytics", "googletagmanager", "doubleclick", "hotjar", "segment.com", "segment.io")
+
+
+@functools.lru_cache(maxsize=256)
+def _text_pattern(text: str) -> "re.Pattern[str]":
+    # feeds repeat the same link texts run after run; compile each needle once
+    return re.compile(re.escape(text), re.IGNORECASE)
+
+
+def _is_blocked(request) -> bool:
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    url = request.url
+    return any(part in url for part in BLOCKED_URL_PARTS)
+
+
+def _block_unneeded(route):
+    if _is_blocked(route.request):
+        route.abort()
+    else:
+        route.continue_()
+
+
+class _ClickMissed(Exception):
+    """Raised inside expect_navigation when nothing was clicked, so the navigation isn't awaited."""
+
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__(result.get("info"))
+        self.result = result
+
+
+def _move_file(src: str, dest: str):
+    try:
+        os.replace(src, dest)
+    except OSError:
+        # different filesystem, a rename is not possible
+        shutil.move(src, dest)
+
+
+def staging_dir(download_dir: str) -> str:
+    """
+    Directory the browser should write download artifacts to for download_dir.
+    It lives inside download_dir, so artifacts are on the destination filesystem and
+    moving a finished download into place is a rename, not a copy.
+    """
+    path = os.path.join(os.path.abspath(download_dir), STAGING_DIRNAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _batch_url_downloads(steps: List[Dict[str, Any]]) -> Iterator[List[Tuple[int, Dict[str, Any]]]]:
+    """
+    Split steps into batches of (index, step).
+    Consecutive download steps with a direct url are independent of the page, so they
+    are grouped together; every other step is a batch of its own.
+    """
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+    for idx, step in enumerate(steps, start=1):
+        if (step.get("action") or "").lower() == "download" and "url" in step:
+            batch.append((idx, step))
+            continue
+        if batch:
+            yield batch
+            batch = []
+        yield [(idx, step)]
+    if batch:
+        yield batch
 
 
 class FeedGuideRunner:
@@ -19,88 +138,438 @@ class FeedGuideRunner:
         browser_name: str = "chromium",
         step_timeout_ms: int = 30000,
         reuse_browser: bool = False,
+        context_refresh_runs: int = 1,
+        user_data_dir: Optional[str] = None,
+        block_resources: bool = False,
+        selector_cache_path: Optional[str] = None,
+        cdp_downloads: bool = False,
     ):
+        """
+        download_dir: downloads are staged in download_dir/.staging, which is fixed when the
+        browser launches; runners with different download_dirs therefore get separate pooled
+        browsers. Share one download_dir to share one browser (not needed with PLAYWRIGHT_CDP_URL).
+        context_refresh_runs: with reuse_browser, number of run() calls served by one
+        BrowserContext before it is closed and replaced (1 = fresh context per run).
+        A context holds on to every resource it has loaded until closed.
+        user_data_dir: if set (e.g. DEFAULT_PROFILE_DIR), run in a persistent profile so the
+        HTTP cache survives between runs. Such a context is its own browser, not the pooled one,
+        so combine it with reuse_browser=True (and context_refresh_runs > 1) to avoid a browser
+        launch per run. A profile directory can only be used by one runner at a time.
+        block_resources: abort images, fonts, media and known trackers
+        (BLOCKED_RESOURCE_TYPES / BLOCKED_URL_PARTS). Trade-off: Playwright disables the HTTP
+        cache for a context with a route installed, so scripts are re-fetched on every
+        navigation; it is therefore ignored when user_data_dir is set.
+        selector_cache_path: if set (e.g. DEFAULT_SELECTOR_CACHE), JSON file mapping (host + path, text)
+        to the CSS path a click-by-text resolved to, so replays of a feed click directly. Only elements
+        whose text content contains the text are remembered.
+        cdp_downloads: chromium only. Let the context write downloads straight to disk
+        (Browser.setDownloadBehavior, into a private per-run directory under download_dir) and
+        pick the file up from there, instead of going through Playwright's Download object.
+        This replaces the download behavior Playwright set for the context, so its download
+        events (expect_download) should not be relied on there. Ignored when attached to a
+        remote browser via PLAYWRIGHT_CDP_URL, since downloadPath is a local path.
+        """
         self.download_dir = os.path.abspath(download_dir)
         os.makedirs(self.download_dir, exist_ok=True)
         self.headless = headless
         self.browser_name = browser_name
         self.step_timeout = step_timeout_ms
         self.reuse_browser = reuse_browser
-        self._playwright = None
+        self.context_refresh_runs = max(1, context_refresh_runs)
+        self.user_data_dir = os.path.expanduser(user_data_dir) if user_data_dir else None
+        self.block_resources = block_resources
+        self.selector_cache_path = selector_cache_path
+        self.cdp_downloads = cdp_downloads and browser_name == "chromium" and not os.getenv(CDP_URL_ENV)
+        self._cdp_download_dir: Optional[str] = None  # per run, so runners sharing download_dir can't swap files
+        self._text_cache: Dict[str, str] = self._load_text_cache()
+        # entries set (path) or dropped (None) since the last save, merged into the file on save
+        self._text_cache_changes: Dict[str, Optional[str]] = {}
         self._browser = None
         self._context = None
+        self._runs_since_context_refresh = 0
+        self._page = None  # page the steps act on; click_new_page switches it
+        # pooled session so direct downloads from the same host reuse TCP/TLS connections
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=3, backoff_factor=0.3))
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update({"User-Agent": "FeedGuide/1.0"})
+        self._handlers = {
+            "goto": self._do_goto,
+            "wait": self._do_wait,
+            "wait_for_selector": self._do_wait_for_selector,
+            "fill": self._do_fill,
+            "click": self._do_click,
+            "click_text": self._do_click,
+            "click_new_page": self._do_click_new_page,
+            "download": self._do_download,
+        }
 
         if self.reuse_browser:
             self._start_browser()
 
     def _start_browser(self):
-        if self._browser:
+        if self._context:
             return
-        self._playwright = sync_playwright().start()
-        browser_launcher = getattr(self._playwright, self.browser_name)
-        self._browser = browser_launcher.launch(headless=self.headless)
-        self._context = self._browser.new_context(accept_downloads=True)
+        if self.user_data_dir:
+            # persistent profile: warm HTTP cache across runs, closing the context closes its browser
+            os.makedirs(self.user_data_dir, exist_ok=True)
+            browser_launcher = getattr(get_playwright(), self.browser_name)
+            self._context = browser_launcher.launch_persistent_context(
+                self.user_data_dir,
+                accept_downloads=True,
+                service_workers="block",
+                **launch_options(self.browser_name, self.headless, staging_dir(self.download_dir)),
+            )
+        else:
+            # browser comes from the shared pool; only the context belongs to this runner
+            self._browser = get_browser(self.browser_name, self.headless, staging_dir(self.download_dir))
+            self._context = self._browser.new_context(accept_downloads=True, service_workers="block")
+        if self.block_resources and not self.user_data_dir:
+            # a route turns off the HTTP cache, the whole point of a persistent profile
+            self._context.route("**/*", _block_unneeded)
+        self._runs_since_context_refresh = 0
 
     def _stop_browser(self):
+        # never close the pooled browser here, see browser_pool.close_browser
         if self._context:
             self._context.close()
             self._context = None
-        if self._browser:
-            self._browser.close()
-            self._browser = None
-        if self._playwright:
-            self._playwright.stop()
-            self._playwright = None
+        self._browser = None
+        # cookies servers set on direct downloads belong to that browsing session too
+        self._session.cookies.clear()
+
+    def close(self):
+        """Release the runner's context and HTTP session. The pooled browser stays up."""
+        self._stop_browser()
+        self._session.close()
 
     def _ensure_page(self):
-        if not self.reuse_browser:
-            # ephemeral browser per run
-            self._start_browser()
-            page = self._context.new_page()
-            return page, True  # page, created_now
+        # a reused context is recycled every context_refresh_runs runs (the browser stays up)
+        if self._context and self._runs_since_context_refresh >= self.context_refresh_runs:
+            self._stop_browser()
+        self._start_browser()
+        self._runs_since_context_refresh += 1
+        page = self._context.new_page()
+        if self.cdp_downloads:
+            self._cdp_download_dir = tempfile.mkdtemp(prefix=".cdp-", dir=self.download_dir)
+            self._enable_cdp_downloads(page)
+        return page, True  # page, created_now
+
+    def _enable_cdp_downloads(self, page):
+        # Browser.setDownloadBehavior is per browser context, so pages opened later are covered too
+        cdp = self._context.new_cdp_session(page)
+        try:
+            context_id = cdp.send("Target.getTargetInfo")["targetInfo"]["browserContextId"]
+            cdp.send("Browser.setDownloadBehavior", {
+                "behavior": "allow", "downloadPath": self._cdp_download_dir, "browserContextId": context_id,
+            })
+        finally:
+            cdp.detach()
+
+    def _load_text_cache(self) -> Dict[str, str]:
+        if not self.selector_cache_path:
+            return {}
+        try:
+            with open(self.selector_cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_text_cache(self):
+        if not (self.selector_cache_path and self._text_cache_changes):
+            return
+        # other runners may have saved since we loaded: apply only our changes on top of the file
+        cache = self._load_text_cache()
+        for key, path in self._text_cache_changes.items():
+            if path is None:
+                cache.pop(key, None)
+            else:
+                cache[key] = path
+        try:
+            os.makedirs(os.path.dirname(self.selector_cache_path), exist_ok=True)
+            tmp = f"{self.selector_cache_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(cache, f, indent=1)
+            os.replace(tmp, self.selector_cache_path)
+            self._text_cache = cache
+            self._text_cache_changes.clear()
+        except OSError:
+            pass
+
+    def _set_text_cache(self, key: str, path: Optional[str]):
+        if path is None:
+            self._text_cache.pop(key, None)
         else:
-            if not self._context:
-                self._start_browser()
-            page = self._context.new_page()
-            return page, True
+            self._text_cache[key] = path
+        self._text_cache_changes[key] = path
+
+    def _click_and_remember(self, locator, key: Optional[str], text: str):
+        target = locator.first
+        # resolve the path before clicking: the click may navigate away from the element
+        needle = " ".join(text.split()).lower()
+        path = target.evaluate(CSS_PATH_JS, needle, timeout=self.step_timeout) if key else None
+        target.click(timeout=self.step_timeout)
+        if path:
+            self._set_text_cache(key, path)
 
     def _safe_click_by_text(self, page, text: str):
-        # try Playwright text selector (first), fallback to searching anchors/buttons
+        # all matching happens browser-side: one locator query instead of an IPC call per element
+        pattern = _text_pattern(text)
+        key = None
+        if self.selector_cache_path:
+            url = urlsplit(page.url)
+            key = f"{url.netloc}{url.path}\t{text}"
+        # replay: the element this text resolved to last time, if it still carries the text
+        cached = self._text_cache.get(key) if key else None
+        if cached:
+            try:
+                locator = page.locator(cached).filter(has_text=pattern)
+                # the page may still be rendering; give the element a moment to attach
+                locator.first.wait_for(state="attached", timeout=min(self.step_timeout, SELECTOR_CACHE_WAIT_MS))
+                locator.first.click(timeout=self.step_timeout)
+                return True, f"Clicked cached selector for text='{text}'"
+            except Exception:
+                pass
+            self._set_text_cache(key, None)
+        # fast path: a link whose accessible name contains the text
+        try:
+            link = page.get_by_role("link", name=pattern)
+            if link.count():
+                self._click_and_remember(link, key, text)
+                return True, f"Clicked link with text='{text}'"
+        except Exception:
+            pass
+        # try Playwright text selector, fallback to anchors/buttons filtered by text
         try:
-            locator = page.get_by_text(text, exact=False)
-            locator.first.click(timeout=self.step_timeout)
+            self._click_and_remember(page.get_by_text(text, exact=False), key, text)
             return True, f"Clicked by text='{text}'"
         except Exception:
-            # fallback: iterate anchors
+            # get_by_text already waited a full step_timeout; only retry if something matches now
             try:
-                anchors = page.query_selector_all("a, button, [role='link'], [role='button']")
-                for a in anchors:
-                    try:
-                        inner = (a.inner_text() or "").strip()
-                        if not inner:
-                            continue
-                        if text.lower() in inner.lower():
-                            a.click(timeout=self.step_timeout)
-                            return True, f"Clicked fallback element with text='{inner}'"
-                    except Exception:
-                        continue
+                locator = page.locator(CLICKABLE_SELECTOR).filter(has_text=pattern)
+                if locator.count():
+                    self._click_and_remember(locator, key, text)
+                    return True, f"Clicked fallback element with text='{text}'"
             except Exception:
                 pass
         return False, f"Element with text '{text}' not found"
 
-    def _download_via_requests(self, url: str, save_as: Optional[str] = None) -> Dict[str, Any]:
+    def _store_download(self, download, dest: str):
+        # move the finished artifact instead of letting save_as copy it
+        try:
+            src = download.path()
+        except Exception:
+            src = None  # remote browser: the artifact is not on this machine
+        if src:
+            _move_file(str(src), dest)
+        else:
+            download.save_as(dest)
+
+    def _download_via_browser(self, page, url: str, save_as: Optional[str] = None) -> Dict[str, Any]:
+        # goes through the context's network stack, so cookies from earlier navigation are sent
+        try:
+            resp = page.request.get(url, timeout=60000)
+            try:
+                if not resp.ok:
+                    raise RuntimeError(f"HTTP {resp.status} for url: {url}")
+                filename = save_as or url.split("/")[-1] or "download.bin"
+                dest = os.path.join(self.download_dir, filename)
+                with open(dest, "wb") as f:
+                    f.write(resp.body())
+            finally:
+                resp.dispose()
+            return {"ok": True, "file": dest}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def _browser_credentials(self) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, str]]]:
+        # after navigation, batched downloads send the browser's cookies and User-Agent like a
+        # single url step would; other browser headers (Accept-Language etc.) are not copied
+        if self._page is None or self._page.url == "about:blank":
+            return [], None
+        return self._context.cookies(), {"User-Agent": self._page.evaluate("navigator.userAgent")}
+
+    def _download_batch(self, steps: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # requests releases the GIL while on the socket, so threads overlap the transfers.
+        # Playwright objects are not thread-safe, hence requests rather than page.request.
+        # the cookies go with this batch's requests only; the session outlives the context
+        cookies, headers = self._browser_credentials()
+        jar = requests.cookies.RequestsCookieJar()
+        for c in cookies:
+            jar.set(c["name"], c["value"], domain=c["domain"], path=c["path"])
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_DOWNLOADS, len(steps))) as pool:
+            return list(pool.map(
+                lambda s: self._download_via_requests(s["url"], save_as=s.get("save_as"), headers=headers, cookies=jar),
+                steps,
+            ))
+
+    def _download_via_requests(
+        self,
+        url: str,
+        save_as: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+        cookies: Optional[requests.cookies.RequestsCookieJar] = None,
+    ) -> Dict[str, Any]:
         try:
-            resp = requests.get(url, stream=True, timeout=60)
+            resp = self._session.get(url, headers=headers, cookies=cookies, stream=True, timeout=60)
             resp.raise_for_status()
             filename = save_as or url.split("/")[-1] or "download.bin"
             dest = os.path.join(self.download_dir, filename)
             with open(dest, "wb") as f:
-                for chunk in resp.iter_content(8192):
+                for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                     f.write(chunk)
             return {"ok": True, "file": dest}
         except Exception as e:
             return {"ok": False, "error": str(e)}
 
+    # ---- step handlers: each takes (page, step) and returns the fields to record for the step ----
+
+    def _do_goto(self, page, step: Dict[str, Any]) -> Dict[str, Any]:
+        url = step["url"]
+        page.goto(url, wait_until=step.get("wait_until", DEFAULT_WAIT_UNTIL), timeout=self.step_timeout)
+        return {"status": "ok", "info": f"Navigated to {url}"}
+
+    def _do_wait(self, page, step: Dict[str, Any]) -> Dict[str, Any]:
+        # prefer waiting for a condition; a fixed delay is either too short or wasted time
+        if "function" in step:
+            page.wait_for_function(step["function"], timeout=self.step_timeout)
+            return {"status": "ok", "info": "Condition met"}
+        if "state" in step:
+            page.wait_for_load_state(step["state"], timeout=self.step_timeout)
+            return {"status": "ok", "info": f"Load state reached: {step['state']}"}
+        secs = float(step.get("seconds", 1))
+        # unlike time.sleep, keeps Playwright processing events while waiting
+        page.wait_for_timeout(secs * 1000)
+        return {"status": "ok", "info": f"Waited {secs}s"}
+
+    def _do_wait_for_selector(self, page, step: Dict[str, Any]) -> Dict[str, Any]:
+        selector = step["selector"]
+        page.wait_for_selector(selector, timeout=self.step_timeout)
+        return {"status": "ok", "info": f"Selector ready: {selector}"}
+
+    def _do_fill(self, page, step: Dict[str, Any]) -> Dict[str, Any]:
+        selector = step["selector"]
+        page.fill(selector, step.get("value", ""), timeout=self.step_timeout)
+        return {"status": "ok", "info": f"Filled {selector}"}
+
+    def _do_click(self, page, step: Dict[str, Any]) -> Dict[str, Any]:
+        if step.get("expect_navigation"):
+            # wait for the navigation together with the click, not again in the next step
+            wait_until = step.get("wait_until", DEFAULT_WAIT_UNTIL)
+            try:
+                with page.expect_navigation(wait_until=wait_until, timeout=self.step_timeout):
+                    result = self._click(page, step)
+                    if result["status"] != "ok":
+                        raise _ClickMissed(result)
+            except _ClickMissed as e:
+                return e.result
+            return result
+        return self._click(page, step)
+
+    def _click(self, page, step: Dict[str, Any]) -> Dict[str, Any]:
+        selector = step.get("selector")
+        text = step.get("text")
+        # click that may cause navigation (follow)
+        if selector:
+            page.click(selector, timeout=self.step_timeout)
+            return {"status": "ok", "info": f"Clicked selector: {selector}"}
+        if text:
+            ok, info = self._safe_click_by_text(page, text)
+            if not ok and not step.get("continue_on_error", False):
+                raise RuntimeError(info)
+            return {"status": "ok" if ok else "error", "info": info}
+        raise ValueError("click requires selector or text")
+
+    def _do_click_new_page(self, page, step: Dict[str, Any]) -> Dict[str, Any]:
+        # click triggers a new page (tab); we wait for that page and follow it
+        selector = step.get("selector")
+        text = step.get("text")
+        if not (selector or text):
+            raise ValueError("click_new_page needs selector or text")
+        with self._context.expect_page() as new_page_info:
+            if selector:
+                page.click(selector, timeout=self.step_timeout)
+            else:
+                self._safe_click_by_text(page, text)
+        new_page = new_page_info.value
+        new_page.wait_for_load_state(step.get("wait_until", DEFAULT_WAIT_UNTIL), timeout=self.step_timeout)
+        self._page = new_page  # follow new page for subsequent actions
+        return {"status": "ok", "info": f"Opened new page via {'selector' if selector else 'text'}"}
+
+    def _do_download(self, page, step: Dict[str, Any]) -> Dict[str, Any]:
+        # preferred: if url provided => direct download, no click needed
+        if "url" in step:
+            if page.url != "about:blank":
+                # the page has navigated: reuse its session cookies
+                return self._download_via_browser(page, step["url"], save_as=step.get("save_as"))
+            # nothing to authenticate with yet; requests streams to disk instead of buffering
+            return self._download_via_requests(step["url"], save_as=step.get("save_as"))
+
+        selector = step.get("selector")
+        text = step.get("text")
+        if not (selector or text):
+            raise ValueError("download needs selector/text/url")
+        try:
+            if self.cdp_downloads:
+                return self._download_via_cdp(page, selector, text, save_as=step.get("save_as"))
+            # we will use Playwright's expect_download
+            with page.expect_download() as download_info:
+                self._click_for_download(page, selector, text)
+            download = download_info.value
+        except PlaywrightTimeoutError as e:
+            if not step.get("continue_on_error", False):
+                raise
+            return {"status": "error", "error": f"download timeout: {str(e)}"}
+        # save the file locally
+        suggested = download.suggested_filename or step.get("save_as") or "download.bin"
+        save_as = step.get("save_as", suggested)
+        dest = os.path.join(self.download_dir, save_as)
+        self._store_download(download, dest)
+        return {"status": "ok", "file": dest}
+
+    def _click_for_download(self, page, selector: Optional[str], text: Optional[str]):
+        if selector:
+            page.click(selector, timeout=self.step_timeout)
+        else:
+            ok, info = self._safe_click_by_text(page, text)
+            if not ok:
+                raise RuntimeError(info)
+
+    def _download_via_cdp(self, page, selector: Optional[str], text: Optional[str], save_as: Optional[str] = None):
+        # the browser saves into this run's own directory; wait for a new, finished file to show up
+        watch_dir = self._cdp_download_dir
+        before = set(os.listdir(watch_dir))
+        self._click_for_download(page, selector, text)
+        deadline = time.monotonic() + self.step_timeout / 1000
+        while True:
+            new_files = [
+                name for name in os.listdir(watch_dir)
+                if name not in before and not name.endswith(".crdownload")
+            ]
+            if new_files:
+                break
+            if time.monotonic() >= deadline:
+                raise PlaywrightTimeoutError(f"no download appeared within {self.step_timeout}ms")
+            time.sleep(0.1)  # only the filesystem is polled; no driver round-trip per tick
+        src = os.path.join(watch_dir, new_files[0])
+        dest = os.path.join(self.download_dir, save_as or new_files[0])
+        os.replace(src, dest)
+        return {"status": "ok", "file": dest}
+
+    def _do_unknown(self, page, step: Dict[str, Any]) -> Dict[str, Any]:
+        error = f"Unknown action: {step.get('action')}"
+        if not step.get("continue_on_error", False):
+            raise RuntimeError(error)
+        return {"status": "error", "error": error}
+
+    def _execute_step(self, handler, step: Dict[str, Any]) -> Tuple[Optional[Exception], Dict[str, Any]]:
+        """Run one handler; returns (exception or None, fields to record for the step)."""
+        try:
+            return None, handler(self._page, step)
+        except Exception as e:
+            return e, {"status": "error", "error": str(e)}
+
     def run(self, feed_guide: Dict[str, Any]) -> Dict[str, Any]:
         """
         feed_guide: {
@@ -109,6 +578,10 @@ class FeedGuideRunner:
                 {"action":"goto", "url": "..."},
                 {"action":"click", "selector":"...", "continue_on_error":False},
                 {"action":"click", "text":"Surveys and Data"},
+                {"action":"click", "text":"Next", "expect_navigation": True, "wait_until": "domcontentloaded"},
+                {"action":"wait", "state":"networkidle"},
+                {"action":"wait", "function":"() => document.querySelectorAll('a[href$=\".xls\"]').length > 0"},
+                {"action":"wait", "seconds":2},
                 {"action":"download", "selector":"text=bos_history.xls", "save_as":"bos_history.xls"},
                 {"action":"download", "url":"https://example.com/file.xls", "save_as": "..."}
            ]
@@ -116,150 +589,104 @@ class FeedGuideRunner:
         """
         results = {"feed_name": feed_guide.get("feed_name"), "steps": [], "downloads": []}
         steps: List[Dict[str, Any]] = feed_guide.get("steps", [])
-        page, created =  self._ensure_page()
+        handlers = self._handlers
+        add_step = results["steps"].append
+        add_download = results["downloads"].append
+        self._page, created = self._ensure_page()
 
         try:
-            for idx, step in enumerate(steps, start=1):
+            for batch in _batch_url_downloads(steps):
+                if len(batch) > 1:
+                    # independent direct downloads: fetch them in parallel
+                    for (idx, step), r in zip(batch, self._download_batch([s for _, s in batch])):
+                        add_step({"step": idx, "action": "download", "raw": step, **r})
+                        if r.get("ok"):
+                            add_download(r["file"])
+                    continue
+
+                idx, step = batch[0]
                 action = (step.get("action") or "").lower()
-                step_result = {"step": idx, "action": action, "raw": step}
-                try:
-                    if action == "goto":
-                        url = step["url"]
-                        page.goto(url, timeout=self.step_timeout)
-                        step_result["status"] = "ok"
-                        step_result["info"] = f"Navigated to {url}"
-
-                    elif action == "wait":
-                        secs = float(step.get("seconds", 1))
-                        time.sleep(secs)
-                        step_result["status"] = "ok"
-                        step_result["info"] = f"Waited {secs}s"
-
-                    elif action == "wait_for_selector":
-                        selector = step["selector"]
-                        page.wait_for_selector(selector, timeout=self.step_timeout)
-                        step_result["status"] = "ok"
-                        step_result["info"] = f"Selector ready: {selector}"
-
-                    elif action == "fill":
-                        selector = step["selector"]
-                        value = step.get("value", "")
-                        page.fill(selector, value, timeout=self.step_timeout)
-                        step_result["status"] = "ok"
-                        step_result["info"] = f"Filled {selector}"
-
-                    elif action in ("click", "click_text"):
-                        selector = step.get("selector")
-                        text = step.get("text")
-                        # click that may cause navigation (follow)
-                        if selector:
-                            page.click(selector, timeout=self.step_timeout)
-                            step_result["status"] = "ok"
-                            step_result["info"] = f"Clicked selector: {selector}"
-                        elif text:
-                            ok, info = self._safe_click_by_text(page, text)
-                            step_result["status"] = "ok" if ok else "error"
-                            step_result["info"] = info
-                            if not ok and not step.get("continue_on_error", False):
-                                raise RuntimeError(info)
-                        else:
-                            raise ValueError("click requires selector or text")
-
-                    elif action == "click_new_page":
-                        # click triggers a new page (tab); we wait for that page and optionally follow it
-                        selector = step.get("selector")
-                        text = step.get("text")
-                        if selector:
-                            with self._context.expect_page() as new_page_info:
-                                page.click(selector, timeout=self.step_timeout)
-                            new_page = new_page_info.value
-                            new_page.wait_for_load_state("load", timeout=self.step_timeout)
-                            page = new_page  # follow new page for subsequent actions
-                            step_result["status"] = "ok"
-                            step_result["info"] = "Opened new page via selector"
-                        elif text:
-                            with self._context.expect_page() as new_page_info:
-                                ok, info = self._safe_click_by_text(page, text)
-                            new_page = new_page_info.value
-                            new_page.wait_for_load_state("load", timeout=self.step_timeout)
-                            page = new_page
-                            step_result["status"] = "ok"
-                            step_result["info"] = "Opened new page via text"
-                        else:
-                            raise ValueError("click_new_page needs selector or text")
-
-                    elif action == "download":
-                        # preferred: if url provided => direct requests download
-                        if "url" in step:
-                            r = self._download_via_requests(step["url"], save_as=step.get("save_as"))
-                            step_result.update(r)
-                            if r.get("ok"):
-                                results["downloads"].append(r["file"])
-
-                        else:
-                            selector = step.get("selector")
-                            text = step.get("text")
-                            # we will use Playwright's expect_download
-                            if selector or text:
-                                try:
-                                    if selector:
-                                        with page.expect_download() as download_info:
-                                            page.click(selector, timeout=self.step_timeout)
-                                        download = download_info.value
-                                    elif text:
-                                        with page.expect_download() as download_info:
-                                            ok, info = self._safe_click_by_text(page, text)
-                                            if not ok:
-                                                raise RuntimeError(info)
-                                        download = download_info.value
-                                    else:
-                                        raise ValueError("No selector or text provided")
-                                    # save the file locally
-                                    download.save_as("bos_history.xls")
-                                    print("✅ File downloaded:",  download.path())
-
-                                   
-                                    suggested = download.suggested_filename or step.get("save_as") or "download.bin"
-                                    save_as = step.get("save_as", suggested)
-                                    dest = os.path.join(self.download_dir, save_as)
-                                    download.save_as(dest)
-                                    step_result["status"] = "ok"
-                                    step_result["file"] = dest
-                                    results["downloads"].append(dest)
-                                except PlaywrightTimeoutError as e:
-                                    step_result["status"] = "error"
-                                    step_result["error"] = f"download timeout: {str(e)}"
-                                    if not step.get("continue_on_error", False):
-                                        raise
-                            else:
-                                raise ValueError("download needs selector/text/url")
-
-                    else:
-                        step_result["status"] = "error"
-                        step_result["error"] = f"Unknown action: {action}"
-                        if not step.get("continue_on_error", False):
-                            raise RuntimeError(step_result["error"])
-
-                except Exception as e:
-                    step_result["status"] = "error"
-                    step_result["error"] = str(e)
+                error, result = self._execute_step(handlers.get(action, self._do_unknown), step)
+                add_step({"step": idx, "action": action, "raw": step, **result})
+                if error is not None:
                     # stop or continue based on flag
                     if step.get("continue_on_error", False):
-                        results["steps"].append(step_result)
                         continue
-                    else:
-                        results["steps"].append(step_result)
-                        raise
-
-                results["steps"].append(step_result)
+                    raise error
+                if result.get("file"):
+                    add_download(result["file"])
 
         finally:
             # cleanup page if ephemeral
             try:
-                page.close()
+                self._page.close()
             except Exception:
                 pass
-            if not self.reuse_browser:
+            self._page = None
+            # close the context as soon as it has served its runs, not at the start of the next one
+            if not self.reuse_browser or self._runs_since_context_refresh >= self.context_refresh_runs:
                 self._stop_browser()
+            if self._cdp_download_dir:
+                shutil.rmtree(self._cdp_download_dir, ignore_errors=True)
+                self._cdp_download_dir = None
+            self._save_text_cache()
 
         return results
+
+
+class AsyncFeedGuideRunner(FeedGuideRunner):
+    """
+    FeedGuideRunner that fetches each batch of consecutive direct-url downloads concurrently
+    on an asyncio loop over one pooled httpx client (HTTP/2 when h2 is installed), instead of
+    a thread per download. Every other step goes through FeedGuideRunner's handlers, so the
+    browser pool, context reuse, selector cache and persistent profile work the same.
+    run() stays synchronous.
+    """
+
+    def __init__(self, *args, max_parallel: int = MAX_PARALLEL_PAGES, **kwargs):
+        self.max_parallel = max_parallel
+        super().__init__(*args, **kwargs)
+
+    def _download_batch(self, steps: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        cookies, headers = self._browser_credentials()
+        # sync Playwright keeps its own event loop on this thread; run ours on a fresh one
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, self._download_batch_async(steps, cookies, headers)).result()
+
+    async def _download_batch_async(
+        self, steps: List[Dict[str, Any]], cookies: List[Dict[str, Any]], headers: Optional[Dict[str, str]]
+    ) -> List[Dict[str, Any]]:
+        jar = httpx.Cookies()
+        for c in cookies:
+            jar.set(c["name"], c["value"], domain=c["domain"], path=c["path"])
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        # keep-alive (+ HTTP/2 multiplexing) spares a TLS handshake per url. The client is
+        # bound to this asyncio.run() loop, so it lives for one batch
+        async with httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+            timeout=60,
+            follow_redirects=True,
+            cookies=jar,
+            headers=headers or {"User-Agent": self._session.headers["User-Agent"]},
+        ) as client:
+            return await asyncio.gather(
+                *[self._download_via_httpx(client, semaphore, s["url"], save_as=s.get("save_as")) for s in steps]
+            )
+
+    async def _download_via_httpx(
+        self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore, url: str, save_as: Optional[str] = None
+    ) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                filename = save_as or url.split("/")[-1] or "download.bin"
+                dest = os.path.join(self.download_dir, filename)
+                async with client.stream("GET", url) as resp:
+                    resp.raise_for_status()
+                    with open(dest, "wb") as f:
+                        async for chunk in resp.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                            # disk writes off the event loop so parallel downloads keep reading
+                            await asyncio.to_thread(f.write, chunk)
+                return {"ok": True, "file": dest}
+            except Exception as e:
+                return {"ok": False, "error": str(e)}